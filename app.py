@@ -4,7 +4,7 @@ import rasterio
 import numpy as np
 import matplotlib.pyplot as plt
 from src.differencer import compute_change, save_results
-from src.preprocessor import align_images
+from src.preprocessor import align_images, estimate_shift
 from src.demo_data import fetch_demo_data, check_cached_demo_data
 
 st.set_page_config(page_title="GeoShift Change Detection", layout="wide")
@@ -77,6 +77,12 @@ st.sidebar.info(
     """
 )
 
+coregister = st.sidebar.checkbox(
+    "Sub-pixel Co-registration",
+    value=False,
+    help="Estimate and correct small shifts between the images before differencing.",
+)
+
 def save_uploaded_file(uploaded_file, filename):
     with open(filename, "wb") as f:
         f.write(uploaded_file.getbuffer())
@@ -104,7 +110,15 @@ if before_path_to_process and after_path_to_process:
             # Align images
             aligned_after_path = "data/temp/after_aligned.tif"
             os.makedirs("data/temp", exist_ok=True)
-            align_images(after_path_to_process, before_path_to_process, aligned_after_path)
+            shift = None
+            if coregister:
+                shift = estimate_shift(after_path_to_process, before_path_to_process)
+            align_images(
+                after_path_to_process,
+                before_path_to_process,
+                aligned_after_path,
+                shift=shift,
+            )
 
             # Compute change
             diff, mask = compute_change(before_path_to_process, aligned_after_path, threshold)
@@ -177,8 +191,13 @@ if before_path_to_process and after_path_to_process:
                     - **Spectral Change Detection:** Uses NDVI (Normalized Difference Vegetation Index).
                     - **Formula:** `Change = NDVI_after - NDVI_before`
                     - **Thresholding:** Filters out noise based on user input.
+                    - **Co-registration (optional):** Phase correlation corrects small shifts between acquisitions.
                     """
                 )
+                if shift is not None:
+                    st.caption(
+                        f"Estimated shift: dx={shift[0]:.2f} px, dy={shift[1]:.2f} px"
+                    )
 
         except Exception as e:
             st.error(f"An error occurred during processing: {e}")
@@ -1,6 +1,10 @@
+import cv2
+import numpy as np
 import rasterio
 from rasterio.enums import Resampling
-from rasterio.warp import reproject
+from rasterio.transform import Affine
+from rasterio.windows import Window, from_bounds
+from rasterio.warp import reproject, transform_bounds
 
 
 def load_image(filepath):
@@ -22,7 +26,209 @@ def load_image(filepath):
         raise IOError(f"Failed to load image {filepath}: {e}")
 
 
-def align_images(src_path, ref_path, output_path):
+def _phase_correlate(ref, mov, max_freq=0.25):
+    """
+    Estimates the translation of `mov` relative to `ref` with FFT phase correlation.
+
+    The integer peak comes from the phase correlation surface, and the sub-pixel part
+    from a weighted least-squares fit of the cross-power phase slope, which avoids the
+    bias of interpolating the peak itself.
+
+    Returns:
+        tuple: (dx, dy, response) where `mov(x, y) ~= ref(x - dx, y - dy)`.
+    """
+    ref = np.nan_to_num(ref.astype(np.float32))
+    mov = np.nan_to_num(mov.astype(np.float32))
+    # Taper the borders so the image edges don't dominate the spectrum
+    window = cv2.createHanningWindow(ref.shape[::-1], cv2.CV_32F)
+    cross = np.fft.rfft2(((mov - mov.mean()) * window)) * np.conj(
+        np.fft.rfft2((ref - ref.mean()) * window)
+    )
+    weight = np.abs(cross)
+
+    surface = np.fft.irfft2(cross / np.maximum(weight, 1e-12), s=ref.shape)
+    peak_y, peak_x = np.unravel_index(np.argmax(surface), surface.shape)
+    response = float(surface[peak_y, peak_x])
+    height, width = ref.shape
+    dx = peak_x - width if peak_x > width // 2 else peak_x
+    dy = peak_y - height if peak_y > height // 2 else peak_y
+
+    # Remove the integer shift, then fit the remaining phase ramp on low frequencies
+    ky = np.fft.fftfreq(height)[:, None]
+    kx = np.fft.rfftfreq(width)[None, :]
+    phase = np.angle(cross * np.exp(2j * np.pi * (kx * dx + ky * dy)))
+    kx, ky = np.broadcast_arrays(kx, ky)
+    keep = (kx**2 + ky**2 < max_freq**2) & (weight > 0)
+    keep[0, 0] = False
+    w, kx, ky, phase = weight[keep], kx[keep], ky[keep], phase[keep]
+    normal = np.array(
+        [
+            [np.sum(w * kx * kx), np.sum(w * kx * ky)],
+            [np.sum(w * kx * ky), np.sum(w * ky * ky)],
+        ]
+    )
+    if abs(np.linalg.det(normal)) < 1e-12:
+        return float(dx), float(dy), response
+    rx, ry = np.linalg.solve(normal, [np.sum(w * kx * phase), np.sum(w * ky * phase)])
+    return dx - rx / (2 * np.pi), dy - ry / (2 * np.pi), response
+
+
+def _read_decimated(dataset, band, window, shape):
+    """
+    Reads a window of a band decimated to `shape` as float32.
+    """
+    if dataset.overviews(band):
+        # Averaging is served from the closest internal overview
+        resampling = Resampling.average
+    else:
+        # Without overviews only every n-th row and column is read; the aliasing
+        # is harmless since the tile refinement corrects the coarse offset
+        resampling = Resampling.nearest
+    data = dataset.read(band, window=window, out_shape=shape, resampling=resampling)
+    return data.astype(np.float32)
+
+
+def _tile_windows(width, height, tile_size, tiles_per_side):
+    """
+    Places windows at the centres of a `tiles_per_side` grid over the image.
+
+    Tiles in the same grid row share their rows, so striped files are only read in
+    `tiles_per_side` bands.
+    """
+
+    def offsets(length):
+        centres = (np.arange(tiles_per_side) + 0.5) * length / tiles_per_side
+        starts = np.clip(np.round(centres - tile_size / 2), 0, length - tile_size)
+        return np.unique(starts.astype(int))
+
+    return [
+        Window(col, row, tile_size, tile_size)
+        for row in offsets(height)
+        for col in offsets(width)
+    ]
+
+
+def estimate_shift(
+    src_path,
+    ref_path,
+    band=1,
+    overview_factor=8,
+    overview_size=256,
+    tile_size=256,
+    tiles_per_side=3,
+    min_response=0.1,
+):
+    """
+    Estimates the sub-pixel translation between the source image and the reference grid.
+
+    A coarse offset is found by phase correlation on a decimated overview of the
+    central part of both scenes, then refined on a grid of full-resolution tiles
+    resampled onto the reference grid. Only one band is used, the overview comes from
+    internal overviews when present and from a strided read otherwise, and only the
+    sampled tiles are read at full resolution, so the estimate costs a small fraction
+    of differencing the full scene. Matches weaker than `min_response` are ignored,
+    and with no reliable match at all the georeferencing is left as is.
+
+    Args:
+        src_path (str): Path to the image to be aligned.
+        ref_path (str): Path to the reference image.
+        band (int): Band index (1-based) used for matching.
+        overview_factor (int): Decimation factor for the coarse estimate.
+        overview_size (int): Side in pixels of the coarse overview, which covers
+            `overview_size * overview_factor` reference pixels.
+        tile_size (int): Size in pixels of the refinement tiles.
+        tiles_per_side (int): Refinement tiles along each side of the image.
+        min_response (float): Minimum correlation peak for a match to be trusted.
+
+    Returns:
+        tuple: (dx, dy) offset of the source in reference pixels, suitable for
+        `align_images(..., shift=(dx, dy))`.
+    """
+    try:
+        with rasterio.open(ref_path) as ref, rasterio.open(src_path) as src:
+            # Keep overviews large enough for a meaningful correlation peak
+            factor = max(1, min(overview_factor, min(ref.width, ref.height) // 64))
+
+            # --- Coarse estimate on a decimated overview of the scene centre ---
+            side = min(ref.width, ref.height, overview_size * factor)
+            ref_window = Window(
+                (ref.width - side) // 2, (ref.height - side) // 2, side, side
+            )
+            ov_shape = (max(1, side // factor),) * 2
+            scale = side / ov_shape[0]
+            ov_transform = ref.window_transform(ref_window) * Affine.scale(scale)
+            ref_ov = _read_decimated(ref, band, ref_window, ov_shape)
+
+            # Same area of the source, at roughly the same decimation
+            bounds = transform_bounds(ref.crs, src.crs, *ref.window_bounds(ref_window))
+            src_window = (
+                from_bounds(*bounds, transform=src.transform)
+                .round_offsets()
+                .round_lengths()
+                .intersection(Window(0, 0, src.width, src.height))
+            )
+            src_ov_shape = (
+                max(1, round(src_window.height / factor)),
+                max(1, round(src_window.width / factor)),
+            )
+            src_ov = _read_decimated(src, band, src_window, src_ov_shape)
+            src_ov_transform = src.window_transform(src_window) * Affine.scale(
+                src_window.width / src_ov_shape[1], src_window.height / src_ov_shape[0]
+            )
+            mov_ov = np.zeros(ov_shape, dtype=np.float32)
+            reproject(
+                source=src_ov,
+                destination=mov_ov,
+                src_transform=src_ov_transform,
+                src_crs=src.crs,
+                dst_transform=ov_transform,
+                dst_crs=ref.crs,
+                resampling=Resampling.bilinear,
+            )
+            dx, dy, response = _phase_correlate(ref_ov, mov_ov)
+            if response < min_response:
+                # No reliable match, trust the georeferencing as the starting point
+                dx = dy = 0.0
+            dx *= scale
+            dy *= scale
+
+            # --- Refine on full-resolution tiles around the coarse offset ---
+            tile_size = min(tile_size, ref.width, ref.height)
+            residuals = []
+            windows = _tile_windows(ref.width, ref.height, tile_size, tiles_per_side)
+            for window in windows:
+                ref_tile = ref.read(band, window=window)
+                if np.nanstd(ref_tile) == 0:
+                    continue
+
+                # The source grid may be offset by a fraction of a pixel or use another
+                # resolution, so interpolate rather than snapping to the nearest pixel
+                mov_tile = np.zeros(ref_tile.shape, dtype=np.float32)
+                reproject(
+                    source=rasterio.band(src, band),
+                    destination=mov_tile,
+                    src_transform=src.transform,
+                    src_crs=src.crs,
+                    dst_transform=ref.window_transform(window)
+                    * Affine.translation(dx, dy),
+                    dst_crs=ref.crs,
+                    resampling=Resampling.cubic,
+                )
+                rdx, rdy, response = _phase_correlate(ref_tile, mov_tile)
+                if response >= min_response:
+                    residuals.append((rdx, rdy))
+
+        if residuals:
+            # Median keeps tiles covering real change from biasing the offset
+            rdx, rdy = np.median(residuals, axis=0)
+            dx += rdx
+            dy += rdy
+        return float(dx), float(dy)
+    except Exception as e:
+        raise RuntimeError(f"Shift estimation failed: {e}")
+
+
+def align_images(src_path, ref_path, output_path, shift=None):
     """
     Aligns the source image to match the reference image's bounds, resolution, and CRS.
     
@@ -30,6 +236,11 @@ def align_images(src_path, ref_path, output_path):
         src_path (str): Path to the image to be aligned.
         ref_path (str): Path to the reference image.
         output_path (str): Path to save the aligned image.
+        shift (tuple, optional): (dx, dy) offset of the source in reference pixels,
+            e.g. from `estimate_shift`. It is folded into the warp transform and the
+            source is resampled bilinearly to keep the sub-pixel part, which makes
+            alignment slower since each band is warped in memory. Shifts below
+            0.001 px are ignored.
         
     Returns:
         str: Path to the aligned output image.
@@ -42,6 +253,10 @@ def align_images(src_path, ref_path, output_path):
             dst_height = ref.height
             kwargs = ref.meta.copy()
 
+        # A negligible shift isn't worth the slower bilinear warp
+        if shift is not None and max(abs(shift[0]), abs(shift[1])) < 1e-3:
+            shift = None
+
         with rasterio.open(src_path) as src:
             kwargs.update(
                 {
@@ -54,15 +269,37 @@ def align_images(src_path, ref_path, output_path):
 
             with rasterio.open(output_path, "w", **kwargs) as dst:
                 for i in range(1, src.count + 1):
+                    if shift is None:
+                        reproject(
+                            source=rasterio.band(src, i),
+                            destination=rasterio.band(dst, i),
+                            src_transform=src.transform,
+                            src_crs=src.crs,
+                            dst_transform=dst_transform,
+                            dst_crs=dst_crs,
+                            resampling=Resampling.nearest,
+                        )
+                        continue
+
+                    # A dataset band destination always uses the file's own transform,
+                    # so warp onto the shifted grid in memory and write that instead
+                    aligned = np.full(
+                        (dst_height, dst_width),
+                        dst.nodata if dst.nodata is not None else 0,
+                        dtype=dst.dtypes[i - 1],
+                    )
                     reproject(
                         source=rasterio.band(src, i),
-                        destination=rasterio.band(dst, i),
+                        destination=aligned,
                         src_transform=src.transform,
                         src_crs=src.crs,
-                        dst_transform=dst_transform,
+                        src_nodata=src.nodata,
+                        dst_transform=dst_transform * Affine.translation(*shift),
                         dst_crs=dst_crs,
-                        resampling=Resampling.nearest,
+                        dst_nodata=dst.nodata,
+                        resampling=Resampling.bilinear,
                     )
+                    dst.write(aligned, i)
         return output_path
     except Exception as e:
         raise RuntimeError(f"Alignment failed: {e}")
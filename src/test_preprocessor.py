@@ -0,0 +1,123 @@
+from src.preprocessor import align_images, estimate_shift
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+import os
+import tempfile
+
+PIXEL_SIZE = 30
+ORIGIN = (500000, 4000000)
+
+
+def shifted_scene(width, height, dx, dy, seed=0):
+    """
+    Builds a smooth random scene and a copy shifted by (dx, dy) pixels.
+    """
+    rng = np.random.default_rng(seed)
+    noise = np.fft.fft2(rng.random((height, width)))
+    ky = np.fft.fftfreq(height)[:, None]
+    kx = np.fft.fftfreq(width)[None, :]
+    # Low-pass to get scene-like texture, shift exactly in the Fourier domain
+    lowpass = np.exp(-((kx**2 + ky**2) / 0.01))
+    before = np.real(np.fft.ifft2(noise * lowpass))
+    after = np.real(
+        np.fft.ifft2(noise * lowpass * np.exp(-2j * np.pi * (kx * dx + ky * dy)))
+    )
+    scale = 1000 / (before.max() - before.min())
+    return (before * scale).astype(np.float32), (after * scale).astype(np.float32)
+
+
+def write_geotiff(path, data, transform):
+    height, width = data.shape
+    profile = {
+        "driver": "GTiff",
+        "width": width,
+        "height": height,
+        "count": 4,
+        "dtype": rasterio.float32,
+        "crs": "EPSG:32613",
+        "transform": transform,
+    }
+    with rasterio.open(path, "w", **profile) as dst:
+        for i in range(1, 5):
+            dst.write(data, i)
+
+
+def test_coregistration():
+    true_shift = (5.3, -2.6)
+    before, after = shifted_scene(1024, 768, *true_shift)
+    transform = from_origin(*ORIGIN, PIXEL_SIZE, PIXEL_SIZE)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before_path = os.path.join(tmp, "before.tif")
+        after_path = os.path.join(tmp, "after.tif")
+        aligned_path = os.path.join(tmp, "aligned.tif")
+        write_geotiff(before_path, before, transform)
+        write_geotiff(after_path, after, transform)
+
+        shift = estimate_shift(after_path, before_path)
+        assert np.allclose(shift, true_shift, atol=0.05)
+
+        # Identical images must not be shifted
+        assert np.allclose(estimate_shift(before_path, before_path), (0, 0), atol=1e-3)
+
+        align_images(after_path, before_path, aligned_path, shift=shift)
+        with rasterio.open(aligned_path) as src:
+            aligned = src.read(1)
+
+    # Compare away from the borders, where the shift pulls in empty pixels
+    inner = (slice(16, -16), slice(16, -16))
+    err_before = np.abs(after[inner] - before[inner]).mean()
+    err_after = np.abs(aligned[inner] - before[inner]).mean()
+    assert err_after < 0.1 * err_before
+
+
+def test_coregistration_offset_grid():
+    # Content shifted by 2 px in reference pixels, with the after grid origin
+    # offset by a fraction of a pixel so its pixels don't line up with the reference
+    true_shift = (2.0, -1.0)
+    for offset in (0.3, 0.5, 0.7):
+        before, _ = shifted_scene(1024, 768, 0, 0)
+        _, after = shifted_scene(1024, 768, true_shift[0] - offset, true_shift[1])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            before_path = os.path.join(tmp, "before.tif")
+            after_path = os.path.join(tmp, "after.tif")
+            write_geotiff(
+                before_path, before, from_origin(*ORIGIN, PIXEL_SIZE, PIXEL_SIZE)
+            )
+            write_geotiff(
+                after_path,
+                after,
+                from_origin(
+                    ORIGIN[0] + offset * PIXEL_SIZE, ORIGIN[1], PIXEL_SIZE, PIXEL_SIZE
+                ),
+            )
+            shift = estimate_shift(after_path, before_path)
+
+        assert np.allclose(shift, true_shift, atol=0.05), f"offset {offset}: {shift}"
+
+
+def test_coregistration_finer_resolution():
+    # After image at half the reference pixel size, the shift is still reported
+    # in reference pixels
+    true_shift = (2.0, -1.5)
+    fine, fine_after = shifted_scene(2048, 1536, 2 * true_shift[0], 2 * true_shift[1])
+    before = fine.reshape(768, 2, 1024, 2).mean(axis=(1, 3))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before_path = os.path.join(tmp, "before.tif")
+        after_path = os.path.join(tmp, "after.tif")
+        write_geotiff(before_path, before, from_origin(*ORIGIN, PIXEL_SIZE, PIXEL_SIZE))
+        write_geotiff(
+            after_path, fine_after, from_origin(*ORIGIN, PIXEL_SIZE / 2, PIXEL_SIZE / 2)
+        )
+        shift = estimate_shift(after_path, before_path)
+
+    assert np.allclose(shift, true_shift, atol=0.05)
+
+
+if __name__ == "__main__":
+    test_coregistration()
+    test_coregistration_offset_grid()
+    test_coregistration_finer_resolution()